@@ -0,0 +1,69 @@
+"""
+Gunicorn configuration for the Ingestion/Reporting API.
+Usage: gunicorn -c gunicorn_conf.py ingestion_api:app
+"""
+
+import multiprocessing
+import os
+import signal
+
+bind = os.environ.get('BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', '8'))
+
+# The app is imported in each worker after the fork, so every worker gets its
+# own queue instance and file handles
+preload_app = False
+
+# Processor child process for QUEUE_BACKEND=multiprocessing
+_ipc_queue = None
+_processor_pid = None
+
+
+def on_starting(server):
+    """
+    With QUEUE_BACKEND=multiprocessing, create the queue and fork the Processor
+    from the master so that every worker can be handed the same queue.
+    """
+    global _ipc_queue, _processor_pid
+    
+    if os.environ.get('QUEUE_BACKEND') != 'multiprocessing':
+        return
+    
+    import launcher
+    _ipc_queue = multiprocessing.Queue()
+    
+    # Plain fork rather than multiprocessing.Process: workers are forked from
+    # the master too and would otherwise inherit the Process bookkeeping and
+    # try to join a process that is not their child on exit
+    _processor_pid = os.fork()
+    if _processor_pid == 0:
+        # on_exit stops the Processor with SIGINT, which it handles by flushing
+        # its pending batch (run_processor installs the handler)
+        try:
+            launcher.run_processor(_ipc_queue)
+        finally:
+            os._exit(0)
+    
+    server.log.info(f"Started Processor (pid {_processor_pid})")
+
+
+def post_fork(server, worker):
+    """Hand the multiprocessing queue to the newly forked worker."""
+    if _ipc_queue is not None:
+        import shared_queue
+        shared_queue.install_ipc_queue(_ipc_queue)
+
+
+def on_exit(server):
+    """Stop the Processor started by on_starting, letting it flush its last batch."""
+    if _processor_pid is None:
+        return
+    
+    try:
+        os.kill(_processor_pid, signal.SIGINT)
+        os.waitpid(_processor_pid, 0)
+    except (ProcessLookupError, ChildProcessError):
+        # Already exited (and possibly reaped by the master)
+        pass
@@ -4,47 +4,153 @@ High-performance HTTP service for event reception, queueing, and analytics repor
 """
 
 from flask import Flask, request, jsonify
+import calendar
 import queue
-import json
+import re
 import sqlite3
-from datetime import datetime
-from typing import Dict, Any, Tuple, List, Optional
-from shared_queue import get_queue
+import hashlib
+import threading
+import time
+import orjson
+import msgspec
+from cachetools import TTLCache
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Dict, Any, Tuple, List, Optional, Union, Annotated
+from werkzeug.exceptions import RequestEntityTooLarge
+from shared_queue import get_queue, MAX_RECORD_SIZE
 
 app = Flask(__name__)
 
+# Largest accepted request body. The file queue stores an event as a msgpack
+# record of at most MAX_RECORD_SIZE bytes; the msgpack encoding of an event is
+# never more than a few bytes larger than its JSON body, and the headroom also
+# covers the timestamp added to events sent without one.
+MAX_EVENT_SIZE = MAX_RECORD_SIZE - 1024
+app.config['MAX_CONTENT_LENGTH'] = MAX_EVENT_SIZE
+
 # Shared queue for asynchronous processing (accessible by both Ingestion API and Processor)
 event_queue = get_queue()
 
 # Database file path (same as used by Processor)
 DB_FILE = 'analytics.db'
 
+JSON_HEADERS = {'Content-Type': 'application/json'}
+
+# Responses with a fixed body are built once at import time and returned as is
+OK_RESPONSE = app.response_class(
+    orjson.dumps({"message": "Event received"}),
+    status=200, mimetype='application/json'
+)
+CONTENT_TYPE_ERROR = app.response_class(
+    orjson.dumps({"error": "Content-Type must be application/json"}),
+    status=400, mimetype='application/json'
+)
+PAYLOAD_TOO_LARGE_ERROR = app.response_class(
+    orjson.dumps({"error": f"Request body too large: events are limited to {MAX_EVENT_SIZE} bytes"}),
+    status=413, mimetype='application/json'
+)
+QUEUE_FULL_ERROR = app.response_class(
+    orjson.dumps({"error": "Service temporarily unavailable: queue is full"}),
+    status=503, mimetype='application/json'
+)
+
+# Short-lived cache of serialized /stats responses, keyed by (site_id, date).
+# TTLCache is not thread-safe, so access goes through stats_cache_lock.
+STATS_CACHE_TTL = 10  # seconds
+stats_cache = TTLCache(maxsize=10_000, ttl=STATS_CACHE_TTL)
+stats_cache_lock = threading.Lock()
+
 
-def validate_event(data: Dict[str, Any]) -> Tuple[bool, str]:
+def json_response(data: Dict[str, Any], status: int) -> Tuple[bytes, int, Dict[str, str]]:
     """
-    Validate the incoming event data.
+    Build a JSON response serialized with orjson (faster than jsonify).
     
     Args:
-        data: Dictionary containing the event data
+        data: Response body
+        status: HTTP status code
         
     Returns:
-        Tuple of (is_valid, error_message)
+        Tuple of (body, status, headers) accepted by Flask
+    """
+    return orjson.dumps(data), status, JSON_HEADERS
+
+
+_DATE_RE = re.compile(r'[0-9]{4}-[0-9]{2}-[0-9]{2}')
+
+
+@lru_cache(maxsize=1024)
+def date_bounds(date: str) -> Optional[Tuple[int, int]]:
     """
-    # Check if site_id is present and is a string
-    if 'site_id' not in data:
-        return False, "Missing required field: site_id"
+    Convert a YYYY-MM-DD date into the unix timestamp range of that UTC day.
+    The regex rejects malformed input without calling strptime, and results
+    are cached because dashboards keep asking for the same few dates.
     
-    if not isinstance(data['site_id'], str) or not data['site_id'].strip():
-        return False, "site_id must be a non-empty string"
+    Args:
+        date: Date string from the query parameters
+        
+    Returns:
+        (start, end) in unix seconds, end exclusive, or None if the date is invalid
+    """
+    if not _DATE_RE.fullmatch(date):
+        return None
     
-    # Check if event_type is present and is a string
-    if 'event_type' not in data:
-        return False, "Missing required field: event_type"
+    try:
+        day = datetime.strptime(date, '%Y-%m-%d')
+    except ValueError:
+        return None
     
-    if not isinstance(data['event_type'], str) or not data['event_type'].strip():
-        return False, "event_type must be a non-empty string"
+    start = calendar.timegm(day.timetuple())
+    return start, start + 86400
+
+
+# Unix seconds up to the end of year 9999 (the range of RFC 3339 dates), which
+# also rejects millisecond timestamps and values too large for SQLite INTEGER
+MAX_EPOCH_SECONDS = 253402300799
+EpochSeconds = Annotated[int, msgspec.Meta(ge=0, le=MAX_EPOCH_SECONDS)]
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_ONE_SECOND = timedelta(seconds=1)
+
+
+class Event(msgspec.Struct):
+    """
+    Analytics event accepted by POST /event.
+    msgspec.json.decode() parses and type-checks the body against these fields
+    in a single pass; __post_init__ adds the checks types cannot express.
+    timestamp is accepted as unix seconds or as an RFC 3339 / ISO 8601 string,
+    which __post_init__ converts to unix seconds within the EpochSeconds range.
+    """
+    site_id: str
+    event_type: str
+    path: Optional[str] = None
+    user_id: Optional[str] = None
+    timestamp: Union[EpochSeconds, datetime, None] = None
     
-    return True, ""
+    def __post_init__(self):
+        """Reject blank required fields (raised as msgspec.ValidationError)."""
+        if not self.site_id.strip():
+            raise ValueError("site_id must be a non-empty string")
+        
+        if not self.event_type.strip():
+            raise ValueError("event_type must be a non-empty string")
+        
+        if isinstance(self.timestamp, datetime):
+            # Naive datetimes are taken as UTC. Subtracting aware datetimes
+            # cannot overflow, unlike utctimetuple() near years 1 and 9999.
+            timestamp = self.timestamp
+            if timestamp.tzinfo is None:
+                timestamp = timestamp.replace(tzinfo=timezone.utc)
+            seconds = (timestamp - _EPOCH) // _ONE_SECOND
+            if not 0 <= seconds <= MAX_EPOCH_SECONDS:
+                raise ValueError(
+                    "timestamp must be between 1970-01-01T00:00:00Z and 9999-12-31T23:59:59Z"
+                )
+            self.timestamp = seconds
+
+
+# Built once: a reusable Decoder skips the per-call type lookup of msgspec.json.decode()
+_event_decoder = msgspec.json.Decoder(Event)
+_event_asdict = msgspec.structs.asdict
 
 
 @app.route('/event', methods=['POST'])
@@ -58,64 +164,74 @@ def receive_event():
         "event_type": "page_view",      # Required
         "path": "/pricing",             # Optional
         "user_id": "user-xyz-789",      # Optional
-        "timestamp": "2025-11-12T19:30:01Z"  # Optional
+        "timestamp": "2025-11-12T19:30:01Z"  # Optional, or unix seconds
     }
     
     Returns:
         200 OK: Event successfully queued
         400 Bad Request: Invalid JSON or missing required fields
+        413 Payload Too Large: Body larger than MAX_EVENT_SIZE bytes
+        503 Service Unavailable: Write buffer is full
     """
     # Check if request has JSON content
     if not request.is_json:
-        return jsonify({
-            "error": "Content-Type must be application/json"
-        }), 400
+        return CONTENT_TYPE_ERROR
     
     try:
-        # Parse JSON from request body
-        event_data = request.get_json()
-        
-        if event_data is None:
-            return jsonify({
-                "error": "Invalid JSON: empty or malformed request body"
-            }), 400
+        # Parse and validate JSON from request body
+        event = _event_decoder.decode(request.get_data())
         
-        # Validate required fields
-        is_valid, error_message = validate_event(event_data)
-        
-        if not is_valid:
-            return jsonify({
-                "error": error_message
-            }), 400
-        
-        # Add timestamp if not provided
-        if 'timestamp' not in event_data:
-            event_data['timestamp'] = datetime.utcnow().isoformat() + 'Z'
+        # Timestamps are unix seconds by now; default to the time of receipt
+        if event.timestamp is None:
+            event.timestamp = int(time.time())
         
         # Push event to queue (non-blocking, thread-safe)
-        event_queue.put(event_data, block=False)
+        event_queue.put(_event_asdict(event), block=False)
         
         # Immediately return success response
-        return jsonify({
-            "message": "Event received"
-        }), 200
+        return OK_RESPONSE
+        
+    except RequestEntityTooLarge:
+        # Reject here rather than have the queue writer drop the accepted event
+        return PAYLOAD_TOO_LARGE_ERROR
         
     except queue.Full:
-        # Queue is full (shouldn't happen with in-memory queue, but good to handle)
-        return jsonify({
-            "error": "Service temporarily unavailable: queue is full"
-        }), 503
+        # Writer thread is INGEST_BUFFER_SIZE events behind: shed load instead of blocking
+        return QUEUE_FULL_ERROR
         
-    except json.JSONDecodeError as e:
-        return jsonify({
+    except msgspec.ValidationError as e:
+        # Missing or invalid fields (checked before DecodeError, its base class)
+        return json_response({
+            "error": str(e)
+        }, 400)
+        
+    except msgspec.DecodeError as e:
+        return json_response({
             "error": f"Invalid JSON: {str(e)}"
-        }), 400
+        }, 400)
         
     except Exception as e:
         # Catch any other unexpected errors
-        return jsonify({
+        return json_response({
             "error": f"Internal server error: {str(e)}"
-        }), 500
+        }, 500)
+
+
+def stats_response(body: bytes, etag: str):
+    """
+    Build a /stats response carrying an ETag.
+    Returns 304 Not Modified without a body if the client sent a matching If-None-Match.
+    
+    Args:
+        body: Serialized JSON body
+        etag: ETag of the body
+        
+    Returns:
+        Flask response object
+    """
+    response = app.response_class(body, status=200, mimetype='application/json')
+    response.set_etag(etag)
+    return response.make_conditional(request)
 
 
 @app.route('/stats', methods=['GET'])
@@ -129,8 +245,12 @@ def get_stats():
     
     Returns:
         200 OK: Aggregated statistics
+        304 Not Modified: If-None-Match matches the current ETag
         400 Bad Request: Missing or invalid parameters
         404 Not Found: No data found for the given criteria
+    
+    Responses are cached for STATS_CACHE_TTL seconds, so new events can take
+    that long to show up.
     """
     # Get query parameters
     site_id = request.args.get('site_id')
@@ -143,13 +263,18 @@ def get_stats():
         }), 400
     
     # Validate date format if provided
-    if date:
-        try:
-            datetime.strptime(date, '%Y-%m-%d')
-        except ValueError:
-            return jsonify({
-                "error": "Invalid date format. Expected YYYY-MM-DD"
-            }), 400
+    bounds = date_bounds(date) if date else None
+    if date and bounds is None:
+        return jsonify({
+            "error": "Invalid date format. Expected YYYY-MM-DD"
+        }), 400
+    
+    # Serve from the cache while the entry is fresh
+    cache_key = (site_id, date)
+    with stats_cache_lock:
+        cached = stats_cache.get(cache_key)
+    if cached is not None:
+        return stats_response(*cached)
     
     try:
         # Connect to database
@@ -157,73 +282,55 @@ def get_stats():
         conn.row_factory = sqlite3.Row  # Enable column access by name
         cursor = conn.cursor()
         
-        # Build query based on whether date is provided
+        # Build the filter based on whether date is provided
         if date:
-            # Filter by site_id and date (timestamp starts with the date)
-            query = '''
-                SELECT path, user_id, timestamp
-                FROM events
-                WHERE site_id = ? AND timestamp LIKE ?
-            '''
-            date_pattern = f"{date}%"
-            cursor.execute(query, (site_id, date_pattern))
+            # Filter by site_id and the UTC day, a range scan on idx_events_site_ts
+            where = "site_id = ? AND timestamp >= ? AND timestamp < ?"
+            params = (site_id, *bounds)
         else:
             # Filter only by site_id
-            query = '''
-                SELECT path, user_id, timestamp
-                FROM events
-                WHERE site_id = ?
-            '''
-            cursor.execute(query, (site_id,))
-        
-        rows = cursor.fetchall()
-        conn.close()
+            where = "site_id = ?"
+            params = (site_id,)
         
-        # If no data found, return empty results
-        if not rows:
-            return jsonify({
-                "site_id": site_id,
-                "date": date if date else None,
-                "total_views": 0,
-                "unique_users": 0,
-                "top_paths": []
-            }), 200
-        
-        # Aggregate data
-        total_views = len(rows)
-        
-        # Count unique users (excluding NULL/empty user_ids)
-        unique_user_ids = set()
-        for row in rows:
-            user_id = row['user_id']
-            if user_id:
-                unique_user_ids.add(user_id)
-        unique_users = len(unique_user_ids)
-        
-        # Count views per path
-        path_counts = {}
-        for row in rows:
-            path = row['path']
-            if path:
-                path_counts[path] = path_counts.get(path, 0) + 1
-        
-        # Get top 3 paths (or all if less than 3)
-        sorted_paths = sorted(path_counts.items(), key=lambda x: x[1], reverse=True)
+        # Total views and unique users (excluding NULL/empty user_ids)
+        cursor.execute(f'''
+            SELECT COUNT(*) AS total_views,
+                   COUNT(DISTINCT NULLIF(user_id, '')) AS unique_users
+            FROM events
+            WHERE {where}
+        ''', params)
+        totals = cursor.fetchone()
+        
+        # Top 3 paths by views (ties keep the order in which paths were first seen)
+        cursor.execute(f'''
+            SELECT path, COUNT(*) AS views
+            FROM events
+            WHERE {where} AND path IS NOT NULL AND path != ''
+            GROUP BY path
+            ORDER BY views DESC, MIN(id)
+            LIMIT 3
+        ''', params)
         top_paths = [
-            {"path": path, "views": count}
-            for path, count in sorted_paths[:3]
+            {"path": row['path'], "views": row['views']}
+            for row in cursor
         ]
+        conn.close()
         
         # Build response
         response = {
             "site_id": site_id,
             "date": date if date else None,
-            "total_views": total_views,
-            "unique_users": unique_users,
+            "total_views": totals['total_views'],
+            "unique_users": totals['unique_users'],
             "top_paths": top_paths
         }
         
-        return jsonify(response), 200
+        body = orjson.dumps(response)
+        etag = hashlib.md5(body).hexdigest()
+        with stats_cache_lock:
+            stats_cache[cache_key] = (body, etag)
+        
+        return stats_response(body, etag)
         
     except sqlite3.Error as e:
         return jsonify({
@@ -246,7 +353,7 @@ def health_check():
 
 
 if __name__ == '__main__':
-    # Run the Flask app
-    # In production, use a production WSGI server like gunicorn
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    # Run the Flask development server
+    # In production, use gunicorn: gunicorn -c gunicorn_conf.py ingestion_api:app
+    app.run(host='0.0.0.0', port=5000)
 
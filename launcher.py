@@ -0,0 +1,49 @@
+"""
+Launcher: runs the Ingestion/Reporting API and the Processor together.
+Creates a multiprocessing.Queue, starts the Processor as a child process and
+serves the API from this process, so events are handed over in memory instead
+of through the queue file.
+"""
+
+import os
+
+# Must be set before shared_queue is imported (also inherited by the child process)
+os.environ['QUEUE_BACKEND'] = 'multiprocessing'
+
+import multiprocessing
+import shared_queue
+
+
+def run_processor(ipc_queue):
+    """Entry point of the Processor child process."""
+    shared_queue.install_ipc_queue(ipc_queue)
+    
+    import processor
+    processor.run_processor()
+
+
+def main():
+    """Start the Processor child process and run the API until interrupted."""
+    ipc_queue = multiprocessing.Queue()
+    shared_queue.install_ipc_queue(ipc_queue)
+    
+    processor_process = multiprocessing.Process(
+        target=run_processor,
+        args=(ipc_queue,),
+        name='processor'
+    )
+    processor_process.start()
+    
+    try:
+        from ingestion_api import app
+        # The reloader would start a second launcher (and Processor), so keep it off
+        app.run(host='0.0.0.0', port=5000, use_reloader=False)
+    finally:
+        # Ctrl+C also reaches the child, which flushes its pending batch and exits
+        processor_process.join(timeout=5)
+        if processor_process.is_alive():
+            processor_process.terminate()
+
+
+if __name__ == '__main__':
+    main()
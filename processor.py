@@ -3,12 +3,14 @@ Service 2: Processor
 Background worker that consumes events from the queue and persists them to a database.
 """
 
+import os
+import signal
 import sqlite3
 import logging
 import time
 import sys
 import queue
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Tuple
 from shared_queue import get_queue
 
 # Configure logging
@@ -25,29 +27,84 @@ logger = logging.getLogger('processor')
 # Database file path
 DB_FILE = 'analytics.db'
 
+# Batching configuration: a batch is written once it holds BATCH_SIZE events
+# or FLUSH_INTERVAL seconds have passed since its first event, whichever comes first
+BATCH_SIZE = int(os.environ.get('PROCESSOR_BATCH_SIZE', '500'))
+FLUSH_INTERVAL = float(os.environ.get('PROCESSOR_FLUSH_INTERVAL', '0.05'))
+
+_CREATE_TABLE_SQL = '''
+    CREATE TABLE IF NOT EXISTS events (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        site_id TEXT NOT NULL,
+        event_type TEXT NOT NULL,
+        path TEXT,
+        user_id TEXT,
+        timestamp INTEGER
+    )
+'''
+
+_INSERT_SQL = '''
+    INSERT INTO events (site_id, event_type, path, user_id, timestamp)
+    VALUES (?, ?, ?, ?, ?)
+'''
+
+# Table that keeps the original text of timestamps migrate_timestamps() could not convert
+MIGRATION_BACKUP_TABLE = 'events_timestamp_backup'
+
+# Errors caused by the values of a single row (unsupported type, NOT NULL
+# violation, integer too large); insert_events_individually() drops that row
+_ROW_ERRORS = (sqlite3.InterfaceError, sqlite3.ProgrammingError,
+               sqlite3.IntegrityError, OverflowError)
+
+# Long-lived connection and cursor for inserts, opened by init_database().
+# Reusing them keeps the prepared INSERT statement in the connection's cache.
+_conn: Optional[sqlite3.Connection] = None
+_cursor: Optional[sqlite3.Cursor] = None
+
+# Set by the SIGINT/SIGTERM handler; the main loop then stores its pending batch and exits
+_stop_requested = False
+
 
 def init_database():
     """
     Initialize the SQLite database and create the events table if it doesn't exist.
+    Also opens the long-lived connection used by insert_events().
+    
+    The connection runs in autocommit mode so each batch can be wrapped in an
+    explicit transaction. WAL mode lets the Reporting API read while a batch
+    is being written, and synchronous=NORMAL skips the fsync on every commit.
     """
+    global _conn, _cursor
+    
     try:
         conn = sqlite3.connect(DB_FILE)
         cursor = conn.cursor()
         
         # Create events table with the specified schema
+        cursor.execute(_CREATE_TABLE_SQL)
+        migrate_timestamps(conn)
+        
+        # Indexes for the Reporting API: site_id/date filters and top paths
         cursor.execute('''
-            CREATE TABLE IF NOT EXISTS events (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                site_id TEXT NOT NULL,
-                event_type TEXT NOT NULL,
-                path TEXT,
-                user_id TEXT,
-                timestamp TEXT
-            )
+            CREATE INDEX IF NOT EXISTS idx_events_site_ts
+            ON events (site_id, timestamp)
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_events_site_path
+            ON events (site_id, path)
         ''')
         
         conn.commit()
         conn.close()
+        
+        if _conn is None:
+            _conn = sqlite3.connect(DB_FILE, isolation_level=None)
+            _conn.execute('PRAGMA journal_mode=WAL')
+            _conn.execute('PRAGMA synchronous=NORMAL')
+            _conn.execute('PRAGMA cache_size=-64000')  # 64 MB page cache
+            _conn.execute('PRAGMA temp_store=MEMORY')
+            _cursor = _conn.cursor()
+        
         logger.info(f"Database initialized: {DB_FILE}")
         
     except Exception as e:
@@ -55,74 +112,218 @@ def init_database():
         raise
 
 
-def insert_event(event_data: Dict[str, Any]) -> bool:
+def migrate_timestamps(conn: sqlite3.Connection):
+    """
+    Convert the TEXT timestamp column of databases created by earlier versions
+    to INTEGER unix seconds. Date filters compare timestamps as integers, so
+    ISO strings left in a TEXT column would silently be miscounted.
+    
+    SQLite cannot change a column type in place, so the table is rebuilt in a
+    single transaction. ISO strings are converted with strftime('%s'), numbers
+    stored as text are truncated to whole seconds and unparseable values
+    become NULL. Their original text is kept in MIGRATION_BACKUP_TABLE, and
+    the transaction is rolled back if the rebuilt table is missing any row.
+    
+    Args:
+        conn: Open connection to the database
+    """
+    columns = {row[1]: row[2] for row in conn.execute('PRAGMA table_info(events)')}
+    if columns.get('timestamp', '').upper() == 'INTEGER':
+        return
+    
+    logger.warning("Migrating events.timestamp from TEXT to INTEGER unix seconds...")
+    
+    try:
+        conn.execute('BEGIN')
+        conn.execute('ALTER TABLE events RENAME TO events_old')
+        conn.execute(_CREATE_TABLE_SQL)
+        conn.execute('''
+            INSERT INTO events (id, site_id, event_type, path, user_id, timestamp)
+                SELECT id, site_id, event_type, path, user_id,
+                       CASE WHEN timestamp GLOB '[0-9]*'
+                                 AND NOT timestamp GLOB '*[^0-9.]*'
+                                 AND timestamp NOT LIKE '%.%.%'
+                            THEN CAST(CAST(timestamp AS REAL) AS INTEGER)
+                            ELSE CAST(strftime('%s', timestamp) AS INTEGER)
+                       END
+                FROM events_old
+        ''')
+        
+        old_count = conn.execute('SELECT COUNT(*) FROM events_old').fetchone()[0]
+        new_count = conn.execute('SELECT COUNT(*) FROM events').fetchone()[0]
+        if new_count != old_count:
+            raise sqlite3.DatabaseError(
+                f"migrated table has {new_count} rows, expected {old_count}"
+            )
+        
+        # Keep the original text of every timestamp that could not be converted
+        conn.execute(f'''
+            CREATE TABLE IF NOT EXISTS {MIGRATION_BACKUP_TABLE} (
+                id INTEGER PRIMARY KEY,
+                timestamp TEXT
+            )
+        ''')
+        lost = conn.execute(f'''
+            INSERT INTO {MIGRATION_BACKUP_TABLE} (id, timestamp)
+                SELECT events_old.id, events_old.timestamp
+                FROM events_old JOIN events ON events.id = events_old.id
+                WHERE events_old.timestamp IS NOT NULL AND events.timestamp IS NULL
+        ''').rowcount
+        if not lost:
+            conn.execute(f'DROP TABLE {MIGRATION_BACKUP_TABLE}')
+        
+        # Dropping the old table also drops its indexes, which init_database() recreates
+        conn.execute('DROP TABLE events_old')
+        conn.commit()
+        
+    except Exception:
+        conn.rollback()
+        raise
+    
+    if lost:
+        logger.warning(
+            f"{lost} of {old_count} timestamps could not be parsed and were set to NULL; "
+            f"their original values are kept in the {MIGRATION_BACKUP_TABLE} table"
+        )
+    logger.info(f"Migration of events.timestamp complete: {old_count} events")
+
+
+def event_to_row(event_data: Dict[str, Any]) -> Optional[Tuple[Any, ...]]:
+    """
+    Validate a single event and convert it into a row for the events table.
+    
+    Args:
+        event_data: Dictionary containing event data from the queue
+        
+    Returns:
+        Tuple of column values, or None if the event is invalid
+    """
+    # Validate that required fields are present
+    if 'site_id' not in event_data or 'event_type' not in event_data:
+        logger.warning(f"Event missing required fields: {event_data}")
+        return None
+    
+    return (
+        event_data.get('site_id'),
+        event_data.get('event_type'),
+        event_data.get('path'),
+        event_data.get('user_id'),
+        event_data.get('timestamp')
+    )
+
+
+def insert_events(rows: List[Tuple[Any, ...]]) -> bool:
     """
-    Insert an event into the events table.
+    Insert a batch of rows into the events table in a single transaction.
+    If the batch insert fails, the rows are retried one at a time so that a
+    single bad row does not discard the valid rows of its batch.
     
     Args:
-        event_data: Dictionary containing event data
+        rows: List of row tuples as returned by event_to_row()
         
     Returns:
         True if successful, False otherwise
     """
     try:
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
+        _cursor.execute('BEGIN')
+        _cursor.executemany(_INSERT_SQL, rows)
+        _cursor.execute('COMMIT')
         
-        # Insert event into database
-        cursor.execute('''
-            INSERT INTO events (site_id, event_type, path, user_id, timestamp)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (
-            event_data.get('site_id'),
-            event_data.get('event_type'),
-            event_data.get('path'),
-            event_data.get('user_id'),
-            event_data.get('timestamp')
-        ))
+        logger.info(f"Batch processed and inserted: {len(rows)} events")
+        return True
         
-        conn.commit()
-        event_id = cursor.lastrowid
-        conn.close()
+    except sqlite3.OperationalError as e:
+        # Locked database, full disk, I/O error: no row is to blame, so the
+        # whole batch is kept for the processor loop to retry
+        if _conn.in_transaction:
+            _conn.execute('ROLLBACK')
+        logger.error(f"Failed to insert batch of {len(rows)} events: {e}")
+        return False
         
-        logger.info(f"Event processed and inserted: ID={event_id}, site_id={event_data.get('site_id')}, event_type={event_data.get('event_type')}")
+    except Exception as e:
+        if _conn.in_transaction:
+            _conn.execute('ROLLBACK')
+        logger.warning(f"Failed to insert batch of {len(rows)} events, retrying one at a time: {e}")
+    
+    return insert_events_individually(rows)
+
+
+def insert_events_individually(rows: List[Tuple[Any, ...]]) -> bool:
+    """
+    Insert rows one statement at a time in a single transaction, dropping the
+    rows that fail (a failed INSERT only undoes its own statement).
+    Only errors caused by the row itself drop it; any other error (e.g. a
+    locked database) rolls back the whole transaction so the batch is retried.
+    
+    Args:
+        rows: List of row tuples as returned by event_to_row()
+        
+    Returns:
+        True if the transaction was committed, False otherwise
+    """
+    try:
+        inserted = 0
+        _cursor.execute('BEGIN')
+        for row in rows:
+            try:
+                _cursor.execute(_INSERT_SQL, row)
+                inserted += 1
+            except _ROW_ERRORS as e:
+                logger.error(f"Dropping event that could not be inserted: {row}: {e}")
+        _cursor.execute('COMMIT')
+        
+        logger.info(f"Batch processed and inserted: {inserted} of {len(rows)} events")
         return True
         
     except Exception as e:
-        logger.error(f"Failed to insert event: {e}, Event data: {event_data}")
+        if _conn.in_transaction:
+            _conn.execute('ROLLBACK')
+        logger.error(f"Failed to insert batch of {len(rows)} events: {e}")
         return False
 
 
-def process_event(event_data: Dict[str, Any]) -> bool:
+def process_batch(batch: List[Dict[str, Any]]) -> bool:
     """
-    Process a single event: parse and insert into database.
+    Process a batch of events: validate them and insert the valid ones.
     
     Args:
-        event_data: Dictionary containing event data from the queue
+        batch: List of event dictionaries from the queue
         
     Returns:
         True if successful, False otherwise
     """
     try:
-        # Validate that required fields are present
-        if 'site_id' not in event_data or 'event_type' not in event_data:
-            logger.warning(f"Event missing required fields: {event_data}")
-            return False
+        rows = [row for row in map(event_to_row, batch) if row is not None]
+        if not rows:
+            return True
         
-        # Insert event into database
-        return insert_event(event_data)
+        return insert_events(rows)
         
     except Exception as e:
-        logger.error(f"Error processing event: {e}, Event data: {event_data}")
+        logger.error(f"Error processing batch of {len(batch)} events: {e}")
         return False
 
 
+def _request_stop(signum, frame):
+    """Signal handler for SIGINT and SIGTERM: let the main loop shut down cleanly."""
+    global _stop_requested
+    _stop_requested = True
+
+
 def run_processor():
     """
     Main processor loop: continuously pull events from queue and process them.
+    Events are written in batches of up to BATCH_SIZE, at most FLUSH_INTERVAL
+    seconds after the first event of the batch was received. Events only count
+    as consumed (task_done()) once their batch has been stored.
     """
     logger.info("Starting Processor service...")
     
+    # Ctrl+C and the SIGTERM sent by process managers both flush the pending
+    # batch; the flag is checked between events so no insert is interrupted
+    signal.signal(signal.SIGINT, _request_stop)
+    signal.signal(signal.SIGTERM, _request_stop)
+    
     # Initialize database
     try:
         init_database()
@@ -135,35 +336,52 @@ def run_processor():
     
     logger.info("Processor is running. Waiting for events...")
     
+    batch: List[Dict[str, Any]] = []
+    batch_started = time.monotonic()
+    
     # Main processing loop
-    while True:
+    while not _stop_requested:
         try:
-            # Get event from queue (blocking with timeout to allow graceful shutdown)
+            # While a batch is pending only wait for the rest of its flush window,
+            # otherwise block with a timeout to allow graceful shutdown
+            if batch:
+                timeout = max(0.0, FLUSH_INTERVAL - (time.monotonic() - batch_started))
+            else:
+                timeout = 1
+            
             try:
-                event_data = event_queue.get(timeout=1)
+                event_data = event_queue.get(timeout=timeout)
             except queue.Empty:
-                # Timeout occurred, continue loop (allows checking for shutdown signals)
-                continue
+                event_data = None
             
-            # Process the event
             if event_data:
-                success = process_event(event_data)
-                if not success:
-                    logger.warning(f"Failed to process event: {event_data}")
-                
-                # Mark task as done
-                event_queue.task_done()
+                if not batch:
+                    batch_started = time.monotonic()
+                batch.append(event_data)
+            
+            # Flush once the batch is full or its flush window has elapsed
+            if batch and (len(batch) >= BATCH_SIZE or
+                          time.monotonic() - batch_started >= FLUSH_INTERVAL):
+                if process_batch(batch):
+                    # Mark the batch as done only now that it is stored
+                    event_queue.task_done()
+                    batch = []
+                else:
+                    # Keep the batch and retry it rather than dropping its events
+                    logger.warning(f"Failed to process batch of {len(batch)} events, retrying")
+                    time.sleep(1)
                 
-        except KeyboardInterrupt:
-            logger.info("Processor received interrupt signal. Shutting down...")
-            break
         except Exception as e:
             logger.error(f"Unexpected error in processor loop: {e}")
             time.sleep(1)  # Brief pause before retrying
     
+    logger.info("Processor received stop signal. Shutting down...")
+    if batch and process_batch(batch):
+        event_queue.task_done()
+    
+    _conn.close()
     logger.info("Processor stopped.")
 
 
 if __name__ == '__main__':
     run_processor()
-
@@ -1,35 +1,107 @@
 """
 Shared queue module for cross-process communication.
-Uses a file-based queue mechanism that works across separate processes.
-For this exercise, we use a simple JSONL (JSON Lines) file as the queue.
-The file acts as the persistent storage, while each process maintains
-an in-memory buffer for performance.
+By default uses a file-based queue mechanism that works across separate processes.
+For this exercise, we use a simple append-only file as the queue: each event
+is a msgpack record (msgspec) prefixed with its length.
+The file acts as the persistent storage and the only transport; the Ingestion
+API buffers outgoing events in memory and appends them in batches.
+
+The backend can be selected with the QUEUE_BACKEND environment variable:
+    file            - msgpack file queue (default, no external services)
+    redis           - Redis list (LPUSH/BRPOP), requires the redis package
+    multiprocessing - multiprocessing.Queue shared by services started from launcher.py
 """
 
-import json
+import atexit
+import logging
 import os
+import struct
+import msgspec
+import orjson
 import threading
 import queue as std_queue
 import time
 import fcntl
 import platform
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
+
+try:
+    # Optional (Linux only): lets the Processor block until the queue file changes
+    from inotify_simple import INotify, flags as inotify_flags
+except ImportError:
+    INotify = None
 
 # Queue file path
-QUEUE_FILE = 'event_queue.jsonl'
+QUEUE_FILE = 'event_queue.bin'
 LOCK_FILE = 'event_queue.lock'
+OFFSET_FILE = QUEUE_FILE + '.off'  # Byte offset of the next unread event
+# JSON Lines queue file of earlier versions; the Processor imports its unread
+# events into QUEUE_FILE once at startup and then deletes it
+LEGACY_QUEUE_FILE = 'event_queue.jsonl'
+LEGACY_OFFSET_FILE = LEGACY_QUEUE_FILE + '.off'
+# Once the reader has consumed this many bytes and caught up with the writers,
+# the queue file is truncated so it does not grow forever
+COMPACT_THRESHOLD = 1024 * 1024
+# Every record in the queue file is a little-endian uint32 payload length
+# followed by the msgpack-encoded event
+_FRAME_HEADER = struct.Struct('<I')
+# Upper bound for a single record; a larger length in a header means the
+# file is corrupt, so the writer never produces one. The Ingestion API rejects
+# bodies that could exceed it (MAX_EVENT_SIZE) before accepting the event.
+MAX_RECORD_SIZE = 1024 * 1024
+_encoder = msgspec.msgpack.Encoder()
+_decoder = msgspec.msgpack.Decoder(Dict[str, Any])
+# The Ingestion API writer thread appends up to this many events per write,
+# collecting them for at most this many seconds
+WRITE_BATCH_SIZE = 1000
+WRITE_BATCH_INTERVAL = 0.01
+# Maximum number of events waiting for the writer thread; once reached, put()
+# raises queue.Full instead of letting the backlog grow without bound
+WRITE_BUFFER_SIZE = int(os.environ.get('INGEST_BUFFER_SIZE', '100000'))
+# Counting the unread events walks the queue file, so qsize() reuses the
+# count for this many seconds (health checks call it on every probe)
+QSIZE_CACHE_TTL = 1.0
 _queue_lock = threading.Lock()  # For thread safety within a process
 _is_windows = platform.system() == 'Windows'
+_use_inotify = INotify is not None and platform.system() == 'Linux'
+
+# Queue backend selection
+QUEUE_BACKEND = os.environ.get('QUEUE_BACKEND', 'file')
+REDIS_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
+REDIS_QUEUE_KEY = os.environ.get('REDIS_QUEUE_KEY', 'events')
 
+logger = logging.getLogger('shared_queue')
 
-def _append_to_file(event_data: Dict[str, Any]):
-    """Append event to the queue file."""
+
+def _append_to_file(events: List[Dict[str, Any]]):
+    """
+    Append a batch of events to the queue file with a single write.
+    If the write fails part way (e.g. disk full), the file is truncated back to
+    its previous size, so the reader never sees a partial record.
+    """
     try:
-        with open(QUEUE_FILE, 'a') as f:
+        frames = []
+        for event_data in events:
+            payload = _encoder.encode(event_data)
+            if len(payload) > MAX_RECORD_SIZE:
+                # Safety net only: ingestion_api.py already rejects such events with 413
+                logger.error(f"Dropping event of {len(payload)} bytes (MAX_RECORD_SIZE is {MAX_RECORD_SIZE})")
+                continue
+            frames.append(_FRAME_HEADER.pack(len(payload)) + payload)
+        data = b''.join(frames)
+        
+        # Unbuffered, so a failed write leaves nothing behind to be flushed on close
+        with open(QUEUE_FILE, 'ab', buffering=0) as f:
             _acquire_file_lock(f)
             try:
-                f.write(json.dumps(event_data) + '\n')
-                f.flush()  # Ensure data is written immediately
+                size = os.fstat(f.fileno()).st_size
+                try:
+                    view = memoryview(data)
+                    while view:
+                        view = view[f.write(view):]
+                except OSError:
+                    f.truncate(size)
+                    raise
             finally:
                 _release_file_lock(f)
     except Exception as e:
@@ -63,76 +135,112 @@ def _release_file_lock(file_handle):
             pass
 
 
-def _read_from_file() -> Optional[Dict[str, Any]]:
-    """Read and remove the first event from the queue file."""
-    if not os.path.exists(QUEUE_FILE):
-        return None
+def _load_offset() -> int:
+    """Load the byte offset of the next unread event from the offset file."""
+    try:
+        with open(OFFSET_FILE, 'rb') as f:
+            offset = int(f.read().strip() or 0)
+    except (OSError, ValueError):
+        return 0
     
+    # An offset past the end of the queue file means the file was deleted or
+    # replaced since the offset was saved
     try:
-        # Use file locking for cross-process safety
-        with open(QUEUE_FILE, 'r+') as f:
-            _acquire_file_lock(f)
-            try:
-                # Read all lines
-                lines = f.readlines()
-                
-                if not lines:
-                    return None
-                
-                # Parse first line
-                first_line = lines[0].strip()
-                if not first_line:
-                    return None
-                
-                event = json.loads(first_line)
-                
-                # Remove first line and write back
-                f.seek(0)
-                f.truncate()
-                f.writelines(lines[1:])
-                f.flush()
-                
-                return event
-            finally:
-                _release_file_lock(f)
-    except json.JSONDecodeError:
-        # If first line is invalid, remove it and try again
-        try:
-            with open(QUEUE_FILE, 'r+') as f:
-                _acquire_file_lock(f)
-                try:
-                    lines = f.readlines()
-                    if lines:
-                        f.seek(0)
-                        f.truncate()
-                        f.writelines(lines[1:])
-                        f.flush()
-                finally:
-                    _release_file_lock(f)
-        except Exception:
-            pass
-        return None
-    except Exception as e:
-        return None
+        if offset > os.path.getsize(QUEUE_FILE):
+            return 0
+    except OSError:
+        return 0
+    
+    return offset
 
 
-def _count_file_lines() -> int:
-    """Count the number of events in the queue file."""
+def _count_file_events() -> int:
+    """Count the number of unread events in the queue file by walking the record headers."""
     if not os.path.exists(QUEUE_FILE):
         return 0
     
     try:
-        with open(QUEUE_FILE, 'r') as f:
-            return sum(1 for line in f if line.strip())
+        count = 0
+        with open(QUEUE_FILE, 'rb') as f:
+            f.seek(_load_offset())
+            while True:
+                header = f.read(_FRAME_HEADER.size)
+                if len(header) < _FRAME_HEADER.size:
+                    return count
+                
+                # Skip over the payload without reading it
+                f.seek(_FRAME_HEADER.unpack(header)[0], os.SEEK_CUR)
+                count += 1
     except Exception:
         return 0
 
 
+def _import_legacy_queue():
+    """
+    Append the unread events of a JSON Lines queue file left by an earlier
+    version to the queue file, then delete it. Lines that are not valid JSON
+    (e.g. a torn last line) are skipped. A crash part way only imports the
+    events again on the next start, so none are lost.
+    """
+    if not os.path.exists(LEGACY_QUEUE_FILE):
+        return
+    
+    try:
+        with open(LEGACY_OFFSET_FILE, 'rb') as f:
+            offset = int(f.read().strip() or 0)
+    except (OSError, ValueError):
+        offset = 0
+    
+    imported = 0
+    skipped = 0
+    with open(LEGACY_QUEUE_FILE, 'rb') as f:
+        if offset > os.fstat(f.fileno()).st_size:
+            offset = 0
+        f.seek(offset)
+        
+        batch = []
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                batch.append(orjson.loads(line))
+            except orjson.JSONDecodeError:
+                skipped += 1
+                continue
+            if len(batch) >= WRITE_BATCH_SIZE:
+                _append_to_file(batch)
+                imported += len(batch)
+                batch = []
+        if batch:
+            _append_to_file(batch)
+            imported += len(batch)
+    
+    for path in (LEGACY_QUEUE_FILE, LEGACY_OFFSET_FILE):
+        if os.path.exists(path):
+            os.remove(path)
+    
+    if imported or skipped:
+        logger.warning(
+            f"Imported {imported} unread events from {LEGACY_QUEUE_FILE} into {QUEUE_FILE}"
+            + (f", skipped {skipped} invalid lines" if skipped else "")
+        )
+
+
 class SharedQueue:
     """
     A queue-like interface that works across processes using a file backend.
-    For the Ingestion API: uses in-memory queue for speed, syncs to file.
-    For the Processor: reads directly from file (since it's a separate process).
+    The queue file is the only transport: put() appends to it and get() reads
+    from it, so a single consumer (the Processor) sees every event.
+    For the Ingestion API: put() hands events to a background writer thread,
+    which appends them in batches, so a crash loses at most one batch.
+    For the Processor: put() appends to the file directly.
+    
+    The queue file is an append-only log. The Processor keeps it open and
+    tracks its read position in OFFSET_FILE, so taking an event off the queue
+    never rewrites the file. get() only advances the position in memory;
+    task_done() persists it once the events read so far have been stored, so
+    events lost before that (e.g. in a crash) are read again on restart.
     """
     
     def __init__(self, use_file_directly: bool = False):
@@ -140,102 +248,430 @@ class SharedQueue:
         Initialize the shared queue.
         
         Args:
-            use_file_directly: If True, always read from file (for Processor).
-                              If False, use in-memory queue with file sync (for Ingestion API).
+            use_file_directly: If True, put() appends to the file synchronously (for Processor).
+                              If False, put() goes through the writer thread (for Ingestion API).
         """
         self.use_file_directly = use_file_directly
+        
+        if use_file_directly:
+            _import_legacy_queue()
+        
+        # Reader state, used by get()
+        self._reader = None
+        self._inotify = None
+        self._offset_fd = None
+        self._offset = _load_offset()
+        self._saved_offset = self._offset
+        
+        # Last result of _count_file_events() and when it was taken, used by qsize()
+        self._file_events = 0
+        self._file_events_at = None
+        
         if not use_file_directly:
-            self._in_memory_queue = std_queue.Queue()
-            # Load any existing events from file into memory
-            self._load_from_file()
+            # Events waiting to be appended to the file by the writer thread
+            self._write_buffer = std_queue.Queue(maxsize=WRITE_BUFFER_SIZE)
+            self._writer = threading.Thread(target=self._flusher, name='queue-writer', daemon=True)
+            self._writer.start()
+            atexit.register(self._flush_pending)
     
-    def _load_from_file(self):
-        """Load existing events from file into in-memory queue."""
-        if not os.path.exists(QUEUE_FILE):
-            return
+    def _flusher(self):
+        """Writer thread: append pending events to the queue file in batches."""
+        while True:
+            batch = [self._write_buffer.get()]
+            deadline = time.monotonic() + WRITE_BATCH_INTERVAL
+            
+            # Take whatever else is already pending, up to the batch limits
+            while len(batch) < WRITE_BATCH_SIZE and time.monotonic() < deadline:
+                try:
+                    batch.append(self._write_buffer.get_nowait())
+                except std_queue.Empty:
+                    break
+            
+            # Keep retrying the batch rather than dropping events
+            while True:
+                try:
+                    _append_to_file(batch)
+                    break
+                except RuntimeError as e:
+                    logger.error(f"{e}, retrying {len(batch)} events")
+                    time.sleep(1)
+    
+    def _flush_pending(self):
+        """Append events still waiting for the writer thread (called at exit)."""
+        batch = []
+        while True:
+            try:
+                batch.append(self._write_buffer.get_nowait())
+            except std_queue.Empty:
+                break
+        
+        if batch:
+            _append_to_file(batch)
+    
+    def _read_from_file(self) -> Optional[Dict[str, Any]]:
+        """Read the next unread event from the queue file and advance the offset."""
+        if self._reader is None:
+            if not os.path.exists(QUEUE_FILE):
+                return None
+            self._reader = open(QUEUE_FILE, 'rb')
         
         try:
-            with open(QUEUE_FILE, 'r') as f:
-                for line in f:
-                    line = line.strip()
-                    if line:
-                        try:
-                            event = json.loads(line)
-                            self._in_memory_queue.put(event)
-                        except json.JSONDecodeError:
-                            continue
-        except Exception:
-            pass
+            self._reader.seek(self._offset)
+            header = self._reader.read(_FRAME_HEADER.size)
+            if not header:
+                if self._reopen_if_replaced():
+                    return self._read_from_file()
+                
+                # Only once every event read has been stored (see task_done())
+                if self._offset >= COMPACT_THRESHOLD and self._offset == self._saved_offset:
+                    self._compact_file()
+                return None
+            
+            # A writer may still be in the middle of appending this record
+            if len(header) < _FRAME_HEADER.size:
+                self._skip_if_torn(_FRAME_HEADER.size)
+                return None
+            
+            size = _FRAME_HEADER.unpack(header)[0]
+            if size > MAX_RECORD_SIZE:
+                self._skip_to_end(f"record length {size} exceeds MAX_RECORD_SIZE")
+                return None
+            
+            payload = self._reader.read(size)
+            if len(payload) < size:
+                self._skip_if_torn(_FRAME_HEADER.size + size)
+                return None
+            
+            try:
+                event = _decoder.decode(payload)
+            except msgspec.DecodeError as e:
+                # The record boundaries can no longer be trusted
+                self._skip_to_end(f"undecodable record ({e})")
+                return None
+            
+            self._offset += _FRAME_HEADER.size + size
+            return event
+        except Exception as e:
+            logger.error(f"Failed to read from queue file: {e}")
+            return None
+    
+    def _skip_if_torn(self, record_size: int):
+        """
+        Skip an incomplete record at the end of the queue file unless a writer is
+        still appending it. Writers hold the file lock for the whole write, so a
+        record that is still incomplete once the lock is acquired is torn.
+        
+        Args:
+            record_size: Size of the record at the current offset, header included
+        """
+        _acquire_file_lock(self._reader)
+        try:
+            complete = os.fstat(self._reader.fileno()).st_size >= self._offset + record_size
+        finally:
+            _release_file_lock(self._reader)
+        
+        if not complete:
+            self._skip_to_end("incomplete record at the end of the file")
+    
+    def _skip_to_end(self, reason: str):
+        """
+        Give up on the rest of the queue file after finding a corrupt record.
+        Records have no sync marker, so reading continues at the end of the
+        file with the events appended from now on.
+        
+        Args:
+            reason: Description of the corruption for the log
+        """
+        # Under the lock, so the end is not in the middle of a record being written
+        _acquire_file_lock(self._reader)
+        try:
+            end = os.fstat(self._reader.fileno()).st_size
+        finally:
+            _release_file_lock(self._reader)
+        
+        logger.error(
+            f"Corrupt queue file {QUEUE_FILE} at offset {self._offset}: {reason}. "
+            f"Skipping {end - self._offset} bytes to the end of the file"
+        )
+        
+        # Persist the skip right away unless events read before it still wait for task_done()
+        pending = self._offset != self._saved_offset
+        self._offset = end
+        if not pending:
+            self._save_offset()
+    
+    def _reopen_if_replaced(self) -> bool:
+        """
+        Check whether the open queue file was deleted or replaced since it was opened.
+        If so, close it and start over at the beginning of the new file.
+        
+        Returns:
+            True if the reader was reset
+        """
+        try:
+            replaced = os.stat(QUEUE_FILE).st_ino != os.fstat(self._reader.fileno()).st_ino
+        except FileNotFoundError:
+            replaced = True
+        
+        if not replaced:
+            return False
+        
+        logger.warning("Queue file was deleted or replaced, reading the new file from the start")
+        self._reader.close()
+        self._reader = None
+        self._offset = 0
+        self._save_offset()
+        
+        # The watch still refers to the old file
+        if self._inotify is not None:
+            self._inotify.close()
+            self._watch_file()
+        return True
+    
+    def _watch_file(self):
+        """Start watching the queue file for writes with inotify."""
+        # The file has to exist to be watched
+        open(QUEUE_FILE, 'ab').close()
+        self._inotify = INotify()
+        # ATTRIB is reported when the file is unlinked while still open, so a
+        # deleted or replaced file also wakes the reader
+        self._inotify.add_watch(QUEUE_FILE, inotify_flags.MODIFY | inotify_flags.ATTRIB)
+    
+    def _wait_for_write(self, timeout: Optional[float]):
+        """
+        Wait until the queue file may have new data.
+        Blocks on inotify when available, otherwise sleeps briefly.
+        
+        Args:
+            timeout: Maximum time to wait in seconds, None to wait indefinitely
+        """
+        if self._inotify is None:
+            time.sleep(0.1 if timeout is None else min(0.1, timeout))  # Brief sleep before retrying
+            return
+        
+        events = self._inotify.read(timeout=None if timeout is None else int(timeout * 1000))
+        if any(event.mask & inotify_flags.IGNORED for event in events):
+            # The file was deleted or replaced: watch the new one
+            self._inotify.close()
+            self._watch_file()
+    
+    def _save_offset(self):
+        """Persist the current read offset."""
+        if self._offset_fd is None:
+            self._offset_fd = os.open(OFFSET_FILE, os.O_RDWR | os.O_CREAT, 0o644)
+        
+        # Fixed-width record, so it can be overwritten in place without truncating
+        os.lseek(self._offset_fd, 0, os.SEEK_SET)
+        os.write(self._offset_fd, b'%020d' % self._offset)
+        self._saved_offset = self._offset
+    
+    def _compact_file(self):
+        """Truncate the queue file once every event in it has been consumed."""
+        with open(QUEUE_FILE, 'r+b') as f:
+            _acquire_file_lock(f)
+            try:
+                # A writer may have appended since the last read
+                if os.fstat(f.fileno()).st_size != self._offset:
+                    return
+                
+                # Save offset 0 first: a crash before the truncate then only
+                # replays events that were already stored (at-least-once), while
+                # a stale offset into the refilled file would land mid-record
+                self._offset = 0
+                self._save_offset()
+                f.truncate(0)
+            finally:
+                _release_file_lock(f)
     
     def put(self, item: Dict[str, Any], block: bool = True, timeout: Optional[float] = None):
         """Put an item into the queue."""
         if self.use_file_directly:
-            _append_to_file(item)
+            _append_to_file([item])
         else:
-            self._in_memory_queue.put(item, block=block, timeout=timeout)
-            _append_to_file(item)
+            self._write_buffer.put(item, block=block, timeout=timeout)
     
     def get(self, block: bool = True, timeout: Optional[float] = None) -> Dict[str, Any]:
-        """Get an item from the queue."""
-        if self.use_file_directly:
-            # For Processor: read directly from file
-            start_time = time.time()
-            while True:
-                event = _read_from_file()
-                if event is not None:
-                    return event
-                
-                if not block:
+        """Get an item from the queue (reads from the queue file)."""
+        start_time = time.time()
+        if block and _use_inotify and self._inotify is None:
+            # Watch before the first read so no write can slip in between
+            self._watch_file()
+        
+        while True:
+            event = self._read_from_file()
+            if event is not None:
+                return event
+            
+            if not block:
+                raise std_queue.Empty()
+            
+            remaining = None
+            if timeout is not None:
+                elapsed = time.time() - start_time
+                if elapsed >= timeout:
                     raise std_queue.Empty()
-                
-                if timeout is not None:
-                    elapsed = time.time() - start_time
-                    if elapsed >= timeout:
-                        raise std_queue.Empty()
-                
-                time.sleep(0.1)  # Brief sleep before retrying
+                remaining = timeout - elapsed
+            
+            self._wait_for_write(remaining)
+    
+    def qsize(self) -> int:
+        """
+        Return the approximate size of the queue (unread events in the file plus pending writes).
+        The file part is recounted at most once every QSIZE_CACHE_TTL seconds.
+        """
+        now = time.monotonic()
+        if self._file_events_at is None or now - self._file_events_at >= QSIZE_CACHE_TTL:
+            self._file_events = _count_file_events()
+            self._file_events_at = now
+        
+        pending = 0 if self.use_file_directly else self._write_buffer.qsize()
+        return self._file_events + pending
+    
+    def task_done(self):
+        """
+        Indicate that every event returned by get() so far has been processed.
+        Persists the read offset, so those events are not read again after a restart.
+        """
+        if self._offset != self._saved_offset:
+            self._save_offset()
+    
+    def empty(self) -> bool:
+        """Return True if the queue is empty."""
+        return self.qsize() == 0
+
+
+class RedisQueue:
+    """
+    A queue-like interface backed by a Redis list.
+    Producers LPUSH JSON-encoded events and consumers BRPOP them, so the
+    Ingestion API and the Processor can run as independent services.
+    """
+    
+    def __init__(self):
+        """Connect to the Redis server configured by REDIS_URL."""
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("QUEUE_BACKEND=redis requires the redis package (pip install redis)")
+        
+        self._client = redis.Redis.from_url(REDIS_URL)
+    
+    def put(self, item: Dict[str, Any], block: bool = True, timeout: Optional[float] = None):
+        """Put an item into the queue."""
+        self._client.lpush(REDIS_QUEUE_KEY, orjson.dumps(item))
+    
+    def get(self, block: bool = True, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """Get an item from the queue."""
+        if not block or timeout == 0:
+            raw = self._client.rpop(REDIS_QUEUE_KEY)
         else:
-            # For Ingestion API: use in-memory queue
-            return self._in_memory_queue.get(block=block, timeout=timeout)
+            # BRPOP treats a timeout of 0 as "block forever"
+            result = self._client.brpop(REDIS_QUEUE_KEY, timeout=timeout or 0)
+            raw = result[1] if result else None
+        
+        if raw is None:
+            raise std_queue.Empty()
+        return orjson.loads(raw)
     
     def qsize(self) -> int:
         """Return the approximate size of the queue."""
-        if self.use_file_directly:
-            return _count_file_lines()
-        else:
-            return self._in_memory_queue.qsize()
+        return self._client.llen(REDIS_QUEUE_KEY)
     
     def task_done(self):
         """Indicate that a formerly enqueued task is complete."""
-        if not self.use_file_directly:
-            self._in_memory_queue.task_done()
+        pass
     
     def empty(self) -> bool:
         """Return True if the queue is empty."""
-        if self.use_file_directly:
-            return _count_file_lines() == 0
-        else:
-            return self._in_memory_queue.empty()
+        return self.qsize() == 0
+
+
+class IPCQueue:
+    """
+    A queue-like interface around a multiprocessing.Queue.
+    The underlying queue is created by launcher.py, which starts the Processor
+    as a child process and hands the same queue to both services.
+    """
+    
+    def __init__(self, ipc_queue):
+        """
+        Wrap an existing multiprocessing queue.
+        
+        Args:
+            ipc_queue: multiprocessing.Queue shared between the services
+        """
+        self._queue = ipc_queue
+    
+    def put(self, item: Dict[str, Any], block: bool = True, timeout: Optional[float] = None):
+        """Put an item into the queue."""
+        self._queue.put(item, block=block, timeout=timeout)
+    
+    def get(self, block: bool = True, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """Get an item from the queue."""
+        return self._queue.get(block=block, timeout=timeout)
+    
+    def qsize(self) -> int:
+        """Return the approximate size of the queue."""
+        try:
+            return self._queue.qsize()
+        except NotImplementedError:
+            # qsize() is not available on macOS
+            return 0
+    
+    def task_done(self):
+        """Indicate that a formerly enqueued task is complete."""
+        pass
+    
+    def empty(self) -> bool:
+        """Return True if the queue is empty."""
+        return self._queue.empty()
 
 
 # Global queue instances (one for each process type)
 _ingestion_queue = None
 _processor_queue = None
+_ipc_queue = None
+
+
+def install_ipc_queue(ipc_queue):
+    """
+    Register the multiprocessing queue used by the multiprocessing backend.
+    Must be called in every process before get_queue() (see launcher.py).
+    
+    Args:
+        ipc_queue: multiprocessing.Queue shared between the services
+    """
+    global _ipc_queue
+    _ipc_queue = IPCQueue(ipc_queue)
 
 
 def get_queue(use_file_directly: bool = False):
     """
-    Get or create the shared queue.
+    Get or create the shared queue for the configured QUEUE_BACKEND.
     
     Args:
-        use_file_directly: If True, always read from file (for Processor).
-                          If False, use in-memory queue with file sync (for Ingestion API).
+        use_file_directly: If True, put() appends to the file synchronously (for Processor).
+                          If False, put() goes through the writer thread (for Ingestion API).
+                          Only used by the file backend.
     
     Returns:
-        SharedQueue instance
+        SharedQueue, RedisQueue or IPCQueue instance
     """
     global _ingestion_queue, _processor_queue
     
+    if QUEUE_BACKEND == 'multiprocessing':
+        if _ipc_queue is None:
+            raise RuntimeError("QUEUE_BACKEND=multiprocessing requires the services to be started with launcher.py")
+        return _ipc_queue
+    
+    if QUEUE_BACKEND == 'redis':
+        if _ingestion_queue is None:
+            _ingestion_queue = RedisQueue()
+        return _ingestion_queue
+    
+    if QUEUE_BACKEND != 'file':
+        raise ValueError(f"Unknown QUEUE_BACKEND: {QUEUE_BACKEND}")
+    
     if use_file_directly:
         if _processor_queue is None:
             _processor_queue = SharedQueue(use_file_directly=True)
@@ -244,4 +680,3 @@ def get_queue(use_file_directly: bool = False):
         if _ingestion_queue is None:
             _ingestion_queue = SharedQueue(use_file_directly=False)
         return _ingestion_queue
-
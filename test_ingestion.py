@@ -62,9 +62,33 @@ def test_invalid_json():
     return response.status_code == 400
 
 
+def test_timestamp_range():
+    """Test that ISO timestamps are held to the same range as unix seconds."""
+    print("Test 5: Sending ISO timestamps at the edges of the allowed range...")
+    expected = {
+        "1970-01-01T00:00:00Z": 200,
+        "9999-12-31T23:59:59Z": 200,
+        "1900-01-01T00:00:00Z": 400,
+        "0001-01-01T00:00:00+01:00": 400,
+        "9999-12-31T23:59:59-01:00": 400,
+    }
+    passed = True
+    for timestamp, status in expected.items():
+        event = {
+            "site_id": "site-abc-123",
+            "event_type": "page_view",
+            "timestamp": timestamp
+        }
+        response = requests.post(f"{BASE_URL}/event", json=event)
+        print(f"{timestamp}: {response.status_code} {response.json()}")
+        passed = passed and response.status_code == status
+    print()
+    return passed
+
+
 def test_health_check():
     """Test health check endpoint."""
-    print("Test 5: Checking health endpoint...")
+    print("Test 6: Checking health endpoint...")
     response = requests.get(f"{BASE_URL}/health")
     print(f"Status: {response.status_code}")
     print(f"Response: {response.json()}\n")
@@ -83,6 +107,7 @@ if __name__ == "__main__":
         results.append(("Missing site_id", test_missing_site_id()))
         results.append(("Missing event_type", test_missing_event_type()))
         results.append(("Invalid JSON", test_invalid_json()))
+        results.append(("Timestamp range", test_timestamp_range()))
         results.append(("Health check", test_health_check()))
         
         print("=" * 50)
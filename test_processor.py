@@ -0,0 +1,156 @@
+"""
+Simple test script for the Processor's database writes (processor.py).
+Like test_queue.py it needs no running services: it works on a database in a
+temporary directory.
+"""
+
+import os
+import sqlite3
+import tempfile
+
+import processor
+
+
+def _remove_database():
+    """Close the Processor's connection and delete the database files."""
+    if processor._conn is not None:
+        processor._conn.close()
+        processor._conn = None
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(processor.DB_FILE + suffix):
+            os.remove(processor.DB_FILE + suffix)
+
+
+def _new_database():
+    """Start from an empty database and open the Processor's connection to it."""
+    _remove_database()
+    processor.init_database()
+
+
+def _event(n):
+    """Build a small valid event."""
+    return {"site_id": "site-test", "event_type": "page_view", "path": f"/page-{n}"}
+
+
+def _stored_paths():
+    """Return the paths of all stored events, in insertion order."""
+    conn = sqlite3.connect(processor.DB_FILE)
+    try:
+        return [row[0] for row in conn.execute('SELECT path FROM events ORDER BY id')]
+    finally:
+        conn.close()
+
+
+def test_bad_row_is_dropped():
+    """Test that a row SQLite rejects is dropped and the rest of its batch stored."""
+    print("Test 1: Dropping a row that cannot be inserted...")
+    _new_database()
+    bad = {"site_id": "site-test", "event_type": "page_view", "path": {"not": "text"}}
+    
+    stored = processor.process_batch([_event(1), bad, _event(2)])
+    paths = _stored_paths()
+    
+    print(f"Stored: {stored}, paths: {paths}\n")
+    return stored and paths == ['/page-1', '/page-2']
+
+
+def test_locked_database_keeps_batch():
+    """Test that a locked database fails the batch instead of dropping its rows."""
+    print("Test 2: Keeping a batch while another connection holds the write lock...")
+    _new_database()
+    
+    blocker = sqlite3.connect(processor.DB_FILE, isolation_level=None)
+    blocker.execute('BEGIN IMMEDIATE')
+    processor._conn.execute('PRAGMA busy_timeout=100')
+    try:
+        stored_while_locked = processor.process_batch([_event(1), _event(2)])
+    finally:
+        blocker.execute('ROLLBACK')
+        blocker.close()
+    
+    # The processor loop retries the same batch once the lock is released
+    stored_after = processor.process_batch([_event(1), _event(2)])
+    paths = _stored_paths()
+    
+    print(f"Stored while locked: {stored_while_locked}, after: {stored_after}, paths: {paths}\n")
+    return not stored_while_locked and stored_after and paths == ['/page-1', '/page-2']
+
+
+def test_text_timestamps_are_migrated():
+    """Test that a TEXT timestamp column is converted to INTEGER unix seconds."""
+    print("Test 3: Migrating a TEXT timestamp column...")
+    _remove_database()
+    
+    # Schema and values as stored verbatim by earlier versions
+    timestamps = {
+        '2025-11-12T19:30:01Z': 1762975801,
+        '2025-11-12T21:30:01+02:00': 1762975801,
+        '2025-11-12T19:30:01.123456Z': 1762975801,
+        '1762975801': 1762975801,
+        '1762975801.5': 1762975801,
+        'yesterday': None,
+        None: None,
+    }
+    conn = sqlite3.connect(processor.DB_FILE)
+    conn.execute('''
+        CREATE TABLE events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            site_id TEXT NOT NULL,
+            event_type TEXT NOT NULL,
+            path TEXT,
+            user_id TEXT,
+            timestamp TEXT
+        )
+    ''')
+    conn.execute('CREATE INDEX idx_events_site_ts ON events (site_id, timestamp)')
+    conn.executemany(
+        "INSERT INTO events (site_id, event_type, timestamp) VALUES ('site-test', 'page_view', ?)",
+        [(value,) for value in timestamps]
+    )
+    conn.commit()
+    conn.close()
+    
+    processor.init_database()
+    
+    conn = sqlite3.connect(processor.DB_FILE)
+    try:
+        column_type = {row[1]: row[2] for row in conn.execute('PRAGMA table_info(events)')}['timestamp']
+        converted = [row[0] for row in conn.execute('SELECT timestamp FROM events ORDER BY id')]
+        backup = conn.execute(f'SELECT timestamp FROM {processor.MIGRATION_BACKUP_TABLE}').fetchall()
+        indexes = {row[1] for row in conn.execute('PRAGMA index_list(events)')}
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    finally:
+        conn.close()
+    
+    print(f"Column type: {column_type}, converted: {converted}")
+    print(f"Backup: {backup}, indexes: {sorted(indexes)}\n")
+    return (column_type == 'INTEGER' and
+            converted == list(timestamps.values()) and
+            backup == [('yesterday',)] and
+            {'idx_events_site_ts', 'idx_events_site_path'} <= indexes and
+            'events_old' not in tables)
+
+
+if __name__ == "__main__":
+    print("=" * 50)
+    print("Testing the Processor")
+    print("=" * 50)
+    
+    os.chdir(tempfile.mkdtemp(prefix='processor-test-'))
+    print(f"Working directory: {os.getcwd()}\n")
+    
+    try:
+        results = []
+        results.append(("Bad row dropped", test_bad_row_is_dropped()))
+        results.append(("Locked database keeps batch", test_locked_database_keeps_batch()))
+        results.append(("TEXT timestamps migrated", test_text_timestamps_are_migrated()))
+        
+        print("=" * 50)
+        print("Test Results:")
+        print("=" * 50)
+        for test_name, passed in results:
+            status = "✓ PASS" if passed else "✗ FAIL"
+            print(f"{status}: {test_name}")
+            
+    except Exception as e:
+        print(f"ERROR: {e}")
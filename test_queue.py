@@ -0,0 +1,202 @@
+"""
+Simple test script for the file queue (shared_queue.py).
+Unlike the API test scripts it needs no running services: it works on a
+queue file in a temporary directory.
+"""
+
+import errno
+import io
+import os
+import queue
+import sqlite3
+import tempfile
+
+import orjson
+
+import shared_queue
+
+
+def _new_queue():
+    """Start from an empty queue file and return the Processor's view of it."""
+    for path in (shared_queue.QUEUE_FILE, shared_queue.OFFSET_FILE):
+        if os.path.exists(path):
+            os.remove(path)
+    return shared_queue.SharedQueue(use_file_directly=True)
+
+
+def _event(n):
+    """Build a small valid event."""
+    return {"site_id": "site-test", "event_type": "page_view", "path": f"/page-{n}"}
+
+
+def _append_torn_record():
+    """Append the first half of a record, as left behind by a failed write."""
+    payload = shared_queue._encoder.encode(_event("torn"))
+    record = shared_queue._FRAME_HEADER.pack(len(payload)) + payload
+    with open(shared_queue.QUEUE_FILE, 'ab') as f:
+        f.write(record[:len(record) // 2])
+
+
+def _drain(event_queue):
+    """Read every event currently available."""
+    events = []
+    while True:
+        try:
+            events.append(event_queue.get(timeout=0.2))
+        except queue.Empty:
+            return events
+
+
+def test_torn_record_at_end():
+    """Test that a torn record at the end of the file does not block the queue."""
+    print("Test 1: Reading past a torn record at the end of the file...")
+    event_queue = _new_queue()
+    shared_queue._append_to_file([_event(1), _event(2)])
+    _append_torn_record()
+    
+    before = _drain(event_queue)
+    shared_queue._append_to_file([_event(3)])
+    after = _drain(event_queue)
+    event_queue.task_done()
+    
+    print(f"Read before the torn record: {len(before)}, after it: {len(after)}")
+    print(f"Unread events left: {event_queue.qsize()}\n")
+    return len(before) == 2 and after == [_event(3)] and event_queue.qsize() == 0
+
+
+def test_torn_record_followed_by_events():
+    """Test that the Processor gets past a torn record that later writes were appended to."""
+    print("Test 2: Processing events after a torn record in the middle of the file...")
+    event_queue = _new_queue()
+    shared_queue._append_to_file([_event(1)])
+    _append_torn_record()
+    shared_queue._append_to_file([_event(n) for n in range(50)])
+    
+    # Records have no sync marker, so the reader skips to the end of the file
+    before = _drain(event_queue)
+    shared_queue._append_to_file([_event("after")])
+    after = _drain(event_queue)
+    
+    import processor
+    processor.init_database()
+    stored = processor.process_batch(before + after)
+    event_queue.task_done()
+    rows = sqlite3.connect(processor.DB_FILE).execute('SELECT path FROM events').fetchall()
+    
+    print(f"Stored: {stored}, rows: {rows}\n")
+    return stored and rows == [('/page-1',), ('/page-after',)] and event_queue.qsize() == 0
+
+
+class _FullDiskFile(io.FileIO):
+    """Queue file whose first write stops half way with ENOSPC."""
+    
+    failed = False
+    
+    def write(self, data):
+        if _FullDiskFile.failed:
+            return super().write(data)
+        _FullDiskFile.failed = True
+        super().write(bytes(data[:len(data) // 2]))
+        raise OSError(errno.ENOSPC, os.strerror(errno.ENOSPC))
+
+
+def test_failed_write_is_rolled_back():
+    """Test that a write failing part way leaves no partial record behind."""
+    print("Test 3: Rolling back a write that fails part way...")
+    event_queue = _new_queue()
+    shared_queue._append_to_file([_event(1)])
+    size = os.path.getsize(shared_queue.QUEUE_FILE)
+    
+    shared_queue.open = lambda path, mode, buffering=-1: _FullDiskFile(path, mode)
+    try:
+        shared_queue._append_to_file([_event(2), _event(3)])
+        failed = False
+    except RuntimeError:
+        failed = True
+    finally:
+        del shared_queue.open
+    
+    rolled_back = os.path.getsize(shared_queue.QUEUE_FILE) == size
+    
+    # The writer thread retries the batch, which must then be read intact
+    shared_queue._append_to_file([_event(2), _event(3)])
+    events = _drain(event_queue)
+    
+    print(f"Write failed: {failed}, rolled back: {rolled_back}, events read: {len(events)}\n")
+    return failed and rolled_back and events == [_event(1), _event(2), _event(3)]
+
+
+def test_crash_during_compaction():
+    """Test that a crash while compacting the queue file loses no later events."""
+    print("Test 4: Restarting after a crash part way through compaction...")
+    event_queue = _new_queue()
+    shared_queue._append_to_file([_event(n) for n in range(3)])
+    _drain(event_queue)
+    event_queue.task_done()
+    
+    def crash():
+        raise KeyboardInterrupt
+    
+    # The Processor dies on its next write of the offset file
+    event_queue._save_offset = crash
+    try:
+        event_queue._compact_file()
+    except KeyboardInterrupt:
+        pass
+    
+    # Writers keep appending past the old offset before the Processor restarts
+    shared_queue._append_to_file([_event(n) for n in range(3, 20)])
+    events = _drain(shared_queue.SharedQueue(use_file_directly=True))
+    
+    print(f"Events read after the restart: {len(events)}\n")
+    return events[-17:] == [_event(n) for n in range(3, 20)]
+
+
+def test_legacy_queue_is_imported():
+    """Test that unread events of an old JSON Lines queue file are imported once."""
+    print("Test 5: Importing the unread events of event_queue.jsonl...")
+    _new_queue()
+    
+    # Event 0 was already consumed; the last line was torn by a crash
+    lines = [orjson.dumps(_event(n)) + b'\n' for n in range(3)]
+    with open(shared_queue.LEGACY_QUEUE_FILE, 'wb') as f:
+        f.write(b''.join(lines) + b'{"site_id": "site-te')
+    with open(shared_queue.LEGACY_OFFSET_FILE, 'wb') as f:
+        f.write(b'%020d' % len(lines[0]))
+    
+    events = _drain(shared_queue.SharedQueue(use_file_directly=True))
+    removed = not os.path.exists(shared_queue.LEGACY_QUEUE_FILE)
+    
+    # A restart finds no legacy file and so imports nothing twice
+    shared_queue.SharedQueue(use_file_directly=True)
+    records = shared_queue._count_file_events()
+    
+    print(f"Imported: {len(events)}, legacy file removed: {removed}, records after restart: {records}\n")
+    return events == [_event(1), _event(2)] and removed and records == 2
+
+
+if __name__ == "__main__":
+    print("=" * 50)
+    print("Testing the file queue")
+    print("=" * 50)
+    
+    os.chdir(tempfile.mkdtemp(prefix='queue-test-'))
+    print(f"Working directory: {os.getcwd()}\n")
+    
+    try:
+        results = []
+        results.append(("Torn record at the end", test_torn_record_at_end()))
+        results.append(("Torn record followed by events", test_torn_record_followed_by_events()))
+        results.append(("Failed write rolled back", test_failed_write_is_rolled_back()))
+        results.append(("Crash during compaction", test_crash_during_compaction()))
+        results.append(("Legacy queue imported", test_legacy_queue_is_imported()))
+        
+        print("=" * 50)
+        print("Test Results:")
+        print("=" * 50)
+        for test_name, passed in results:
+            status = "✓ PASS" if passed else "✗ FAIL"
+            print(f"{status}: {test_name}")
+            
+    except Exception as e:
+        print(f"ERROR: {e}")
@@ -55,6 +55,20 @@ def test_stats_no_data():
     return response.status_code == 200
 
 
+def test_stats_not_modified():
+    """Test that repeating a stats request with its ETag returns 304."""
+    print("Test 6: Getting stats again with If-None-Match...")
+    response = requests.get(f"{BASE_URL}/stats?site_id=site-abc-123")
+    etag = response.headers.get("ETag")
+    print(f"ETag: {etag}")
+    response = requests.get(
+        f"{BASE_URL}/stats?site_id=site-abc-123",
+        headers={"If-None-Match": etag}
+    )
+    print(f"Status: {response.status_code}\n")
+    return etag is not None and response.status_code == 304
+
+
 if __name__ == "__main__":
     print("=" * 50)
     print("Testing Reporting API (Service 3)")
@@ -70,6 +84,7 @@ if __name__ == "__main__":
         results.append(("Missing site_id", test_stats_missing_site_id()))
         results.append(("Invalid date format", test_stats_invalid_date()))
         results.append(("No data found", test_stats_no_data()))
+        results.append(("Not modified (ETag)", test_stats_not_modified()))
         
         print("=" * 50)
         print("Test Results:")